@@ -104,9 +104,12 @@ fitting = {
     'pmn_model_suffix': cfg['fitting']['pmn_model_suffix'],
     'ev_threshold': cfg['fitting'].getfloat('ev_threshold'),
     'n_live': cfg['fitting'].getint('n_live'),
+    'importance_nested_sampling':
+            cfg['fitting'].getboolean('importance_nested_sampling'),
     'n_update': cfg['fitting'].getint('n_update'),
     'verb': cfg['fitting'].getboolean('verb'),
     'n_samples_max': cfg['fitting'].getint('n_samples_max'),
+    'compress_pickle': cfg['fitting'].getboolean('compress_pickle'),
     'model_om_range': (cfg['fitting'].getfloat('model_om_lo'),
                        cfg['fitting'].getfloat('model_om_hi')),
     'spectra_norm_range': (cfg['fitting'].getfloat('spectra_norm_lo'),
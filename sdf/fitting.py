@@ -6,18 +6,9 @@ import binarytree as bt
 import numpy as np
 import emcee
 
-# in case we don't have this module
-try:
-    import classifier.photometry
-    import classifier.spectra
-    classifier_module = True
-except ImportError:
-    classifier_module = False
-
 from . import model
 from . import photometry
 from . import spectrum
-from . import filter
 from . import utils
 from . import result
 from . import db
@@ -31,7 +22,7 @@ global_p_rng = ()
 
 def fit_results(file,update_mn=False,update_an=False,
                 update_json=False,update_thumb=False,
-                sort=True,custom_sort=True,nospec=False):
+                sort=True,custom_sort=True,nospec=False,processes=1):
     """Return a list of fitting results.
         
     Parameters
@@ -48,29 +39,30 @@ def fit_results(file,update_mn=False,update_an=False,
         Additonally sort results using per-target config.
     nospec : bool, optional
         Exclude observed specta from fitting (for speed).
+    processes : int, optional
+        Number of models to fit simultaneously.
     """
 
     print(" Fitting")
     results = []
+    get_kw = {'update_mn':update_mn, 'update_an':update_an,
+              'update_json':update_json, 'update_thumb':update_thumb,
+              'nospec':nospec}
 
     # fit specific models if defined by conf, overrides default
     if len(cfg.fitting['models']) > 0:
         for m in cfg.fitting['models']:
-
             print("  ",m)
-            r = result.Result.get(
-                            file,m,update_mn=update_mn,
-                            update_an=update_an,update_json=update_json,
-                            update_thumb=update_thumb,nospec=nospec
-                                           )
 
-            # check for files with no photometry
+        results = result.Result.get_many(file,cfg.fitting['models'],
+                                         processes=processes,**get_kw)
+
+        # check for files with no photometry
+        for r in results:
             if not hasattr(r,'obs'):
                 print("  no photometry = no results")
                 return None
 
-            results.append(r)
-
     else:
         # binary tree-based fitting
         t = model_director(file)
@@ -79,20 +71,19 @@ def fit_results(file,update_mn=False,update_an=False,
         except:
             print_model_tree(t, cute=False)
 
+        # the left model on lower branches is one that was already
+        # done, so keep results to avoid getting them again
+        done = {}
         while t.left is not None and t.right is not None:
 
             print("  ",t.left.value,"vs.",t.right.value)
 
-            r1 = result.Result.get(
-                        file,t.left.value,update_mn=update_mn,
-                        update_an=update_an,update_json=update_json,
-                        update_thumb=update_thumb,nospec=nospec
-                                            )
-            r2 = result.Result.get(
-                        file,t.right.value,update_mn=update_mn,
-                        update_an=update_an,update_json=update_json,
-                        update_thumb=update_thumb,nospec=nospec
-                                            )
+            todo = [m for m in (t.left.value,t.right.value) if m not in done]
+            rs = result.Result.get_many(file,todo,processes=processes,
+                                        **get_kw)
+            done.update(zip(todo,rs))
+            r1 = done[t.left.value]
+            r2 = done[t.right.value]
 
             # check for files with no photometry
             if not hasattr(r1,'obs'):
@@ -113,14 +104,16 @@ def fit_results(file,update_mn=False,update_an=False,
 
     # sort list of results by evidence (required for subsequent custom sort)
     print(' Sorting')
-    if sort or custom_sort:
+    if len(results) < 2:
+        print('   single result, no sorting needed')
+    elif sort or custom_sort:
         print('   sorting results by evidence')
         results = [results[i] for i in result.sort_results(results)]
     else:
         print('   no results sorting')
 
     # sort list of results by custom method
-    if custom_sort:
+    if custom_sort and len(results) > 1:
         print('   applying db.custom_sort results sorting')
         srt = db.custom_sort(file, results)
         if srt is None:
@@ -345,8 +338,12 @@ def residual(param,*args):
             obs_nel,obs_wav,obs_filt,_ = concat_obs(o)
     
     # multiply spectra by appropriate normalisation, ispec starts at
-    # -2 so we can add 1.0 for photometry at the end of the params
-    spec_norm = np.take(np.append(param,1.0),obs_ispec)
+    # -2 so we can add 1.0 for photometry at the end of the params, not
+    # multiplied in place since concat_obs is memoized
+    norms = np.empty(len(param)+1)
+    norms[:-1] = param
+    norms[-1] = 1.0
+    spec_norm = norms[obs_ispec]
     obs_fnu = obs_fnu * spec_norm
     obs_e_fnu = obs_e_fnu * spec_norm
 
@@ -465,6 +462,8 @@ def multinest(o,m,dir):
 
     pmn.run(multinest_lnlike,multinest_prior,m_info['ndim'],
             n_live_points=cfg.fitting['n_live'],
+            importance_nested_sampling=\
+                cfg.fitting['importance_nested_sampling'],
             n_iter_before_update=cfg.fitting['n_update'],
             multimodal=True,sampling_efficiency=0.3,
             verbose=cfg.fitting['verb'],
@@ -497,27 +496,39 @@ def pmn_pc(prob,samples,pcs,axis=0):
     # sort what to do depending on sample array dimension
     if np.ndim(samples) == 3:
     
-        # loop over each column
+        # do as 2d, with the first two dimensions joined
         if axis == 2:
-            out = np.zeros((len(pcs),samples.shape[0],samples.shape[1]))
-            for i in range(samples.shape[0]):
-                for j in range(samples.shape[1]):
-                    out[:,i,j] = pmn_pc(prob,samples[i,j,:],pcs)
-            
-            return out
+            samples = np.asarray(samples)
+            n0,n1,_ = samples.shape
+            out = pmn_pc(prob,samples.reshape((n0*n1,-1)),pcs,axis=1)
+            return out.reshape((len(pcs),n0,n1))
         else:
             raise utils.SdfError("axis must be 2 for 3d samples")
 
     if np.ndim(samples) == 2:
     
         if axis == 1:
-            return pmn_pc(prob,samples.T,pcs) # do for the transpose
+            return pmn_pc(prob,np.asarray(samples).T,pcs) # do for the transpose
         
-        # loop over each column
+        # sort and cumulate all columns at once, only the interpolation
+        # is done per column
         elif axis == 0:
+            samples = np.asarray(samples)
+            prob = np.asarray(prob)
+            if len(prob) != samples.shape[0]:
+                raise utils.SdfError("prob and samples have different lengths"
+                                     " {} and {}".format(len(prob),
+                                                         samples.shape[0]))
+            srt = np.argsort(samples,axis=0,kind='stable')
+            x = np.take_along_axis(samples,srt,axis=0).astype(float)
+            cw = np.cumsum(prob[srt],axis=0,dtype=float)
+            cw /= np.max(cw,axis=0)
+
+            q = np.asarray(pcs)/100.0
             out = np.zeros((len(pcs),samples.shape[1]))
             for i in range(samples.shape[1]):
-                out[:,i] = pmn_pc(prob,samples[:,i],pcs)
+                out[:,i] = np.interp(q, cw[:,i], x[:,i],
+                                     left=x[0,i], right=x[-1,i])
             
             return out
         else:
@@ -207,6 +207,10 @@ class Model(object):
         This is spline interpolation. This doesn't matter too much since
         any high dynamic range parameters are already log spaced.
 
+        The parameters can also be a 2d array with one set of parameters
+        per row (e.g. samples from fitting), in which case the fluxes
+        are returned with shape (filters/wavelengths, samples).
+
         TODO: this is the core of the sdf code in terms of execution
         time. Experiments so far find that map_coordinates is faster
         than RegularGridInterpolator, but is hindered somewhat by the
@@ -221,30 +225,31 @@ class Model(object):
         wave_arr = self.i
         nwav = self.n_i
 
-        # make sure par is a numpy array
-        par_len = len(param)-1
+        # make sure par is a 2d numpy array, one row per parameter set
+        param = np.asarray(param,dtype=float)
+        ndim = param.ndim
+        param = np.atleast_2d(param)
+        nset,par_len = param.shape
+        par_len -= 1
 
-        area_sr = cfg.ssr * 10**( param[-1] )
-        par = param[:par_len]
+        area_sr = cfg.ssr * 10**( param[:,-1] )
+        par = param[:,:par_len]
 
         # scipy.ndimage.map_coordinates, only real difference compared
         # to RegularGridInerpolator is that the coordinates are given
         # in pixels, so must be interpolated from the parameters first
         # using a homegrown 1pt interpolation linterp was no faster than
-        # np.interp
-        coords = []
+        # np.interp. the first coordinate is the filter/wavelength index
+        coords = np.empty((par_len+1,nwav,nset))
+        coords[0] = wave_arr[:,np.newaxis]
         for i,p in enumerate(self.parameters):
-            coords.append( np.interp( par[i],self.param_values[p],
-                                      np.arange(len(self.param_values[p])) ) )
-
-        pargrid = np.tile(np.array(coords),nwav).\
-                          reshape( (nwav,par_len) )
-        pargrid = np.insert(pargrid,0,wave_arr,axis=1)
+            coords[i+1] = np.interp( par[:,i],self.param_values[p],
+                                     np.arange(len(self.param_values[p])) )
 
         # interpolation, sped up by doing spline_filter first and
         # memoizing the result, order must be the same in both calls
         ff = utils.spline_filter_mem(self.log_fnujy_sr_hashed,order=2)
-        fluxes = map_coordinates(ff,pargrid.T,order=2,prefilter=False)
+        fluxes = map_coordinates(ff,coords,order=2,prefilter=False)
         # convert back to real fluxes
         fluxes = 10**fluxes
 
@@ -254,13 +259,17 @@ class Model(object):
         # per-filter normalisation for photometry (leave colours)
         if isinstance(self,PhotModel):
             filt = filter.iscolour(tuple(self.filters.tolist()))
-            norm = np.zeros(len(self.filters)) + area_sr
+            norm = np.zeros((len(self.filters),nset)) + area_sr
             if np.any(filt):
                 norm[filt] = 1.0
         else:
             norm = area_sr
 
-        return norm * fluxes
+        fluxes = norm * fluxes
+        if ndim == 1:
+            return fluxes[:,0]
+        else:
+            return fluxes
     
 
     def copy(self):
@@ -970,39 +979,43 @@ def model_fluxes(m,param,obs_nel,phot_only=False):
     all_fnu is everything added up, with colours/indices added properly,
     comp_fnu[i] contains fluxes from the i-th model component and
     comp_fnu_col[i] contains these with colours computed.
+
+    param can be a 2d array with one set of parameters per row, in which
+    case the fluxes have an extra last dimension for the sets.
     """
-    
+
+    param = np.asarray(param,dtype=float)
     comp_fnu = []
-    all_fnu = []
     i0 = 0
     # loop over model components
     for comp in m:
         # loop over phot/spectra for this component if they exist
         if not isinstance(comp,tuple):
             comp = (comp,)
-        flux = np.array([])
+        flux = []
         # params same for all in each component
         nparam = len(comp[0].parameters)+1
         for mod in comp:
             if phot_only:
                 if not isinstance(mod,PhotModel):
                     continue
-            fnu = mod.fnujy(param[i0:i0+nparam])
-            flux = np.append( flux, fnu )
-        
-        # since we don't know how long all_fnu will be, make sure
-        # comp_fnu has first dimension equal number of components 
-        if len(all_fnu) == 0:
-            all_fnu = flux
-            comp_fnu = np.array([flux])
+            flux.append( mod.fnujy(param[...,i0:i0+nparam]) )
+
+        if len(flux) > 0:
+            comp_fnu.append( np.concatenate(flux) )
         else:
-            all_fnu += flux
-            comp_fnu = np.vstack( (comp_fnu,flux) )
+            comp_fnu.append( np.zeros((0,)+param.shape[:-1]) )
         i0 += nparam
-    
+
+    # first dimension of comp_fnu is the number of components
+    comp_fnu = np.array(comp_fnu)
+    all_fnu = comp_fnu[0].copy()
+    for flux in comp_fnu[1:]:
+        all_fnu += flux
+
     # fill colours, for total and components
     mod_fnu = fill_colours(m[0],all_fnu,obs_nel)
-    comp_fnu_col = np.zeros((len(comp_fnu),len(mod_fnu)))
+    comp_fnu_col = np.zeros((len(comp_fnu),)+mod_fnu.shape)
     for i,fnu in enumerate(comp_fnu):
         comp_fnu_col[i] = fill_colours(m[0],fnu,obs_nel)
 
@@ -1178,8 +1191,11 @@ def fill_colours(comp,mod_fnu,obs_nel):
     Phot/SpecModel component, the extra columns containing the base
     filters for colours are not included in the returned result.
 
+    The first dimension of mod_fnu is fluxes, there may be a second
+    dimension for multiple parameter sets.
+
     """
-    final_fnu = np.array([])
+    final_fnu = []
     if not isinstance(comp,tuple):
         comp = (comp,)
     i0comp = 0 # zeroth index of the current Phot/SpecModel
@@ -1200,15 +1216,13 @@ def fill_colours(comp,mod_fnu,obs_nel):
                         mag = filt.flux2mag(mod_fnu[irel])
                         mags += mag * cb['filterw'][j]
                     mod_fnu[i] = mags
-            final_fnu = np.append(final_fnu,
-                                  mod_fnu[i0comp:i0comp+obs_nel[k]])
+            final_fnu.append(mod_fnu[i0comp:i0comp+obs_nel[k]].copy())
             i0comp += len(mod.filters)
         else:
-            final_fnu = np.append(final_fnu,
-                                  mod_fnu[i0comp:i0comp+obs_nel[k]])
+            final_fnu.append(mod_fnu[i0comp:i0comp+obs_nel[k]].copy())
             i0comp += len(mod.wavelength)
 
-    return final_fnu
+    return np.concatenate(final_fnu)
 
 
 def get_models(obs,names):
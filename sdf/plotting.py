@@ -1,7 +1,6 @@
 import io
 from datetime import datetime
 from os import path,remove
-import pickle
 import requests
 
 import ast
@@ -507,10 +506,9 @@ def pretty_sed(pkl_url=None, pkl_file=None, file=None, nu_fnu=False,
     """
     if pkl_url is not None:
         s = requests.get(pkl_url)
-        r = pickle.loads(s.content)
+        r = utils.loads_pickle(s.content)
     else:
-        with open(pkl_file,'rb') as f:
-            r = pickle.load(f)
+        r = utils.read_pickle(pkl_file)
 
     # refill models, they're deleted to save space at pickling
     mod,plmod = model.get_models(r.obs,r.model_comps)
@@ -1,12 +1,11 @@
 from functools import lru_cache
+from multiprocessing import Pool
 import os.path
-import pickle
-import glob
 import time
 import json
 
 import numpy as np
-from scipy.stats import truncnorm
+from scipy.special import ndtr, ndtri
 from scipy.optimize import minimize
 import matplotlib.pyplot as plt
 import corner
@@ -21,20 +20,39 @@ from . import plotting
 from . import utils
 from . import config as cfg
 
+# unit conversions used for the distributions
+pc_m = u.pc.to(u.m)
+rsun_m = u.R_sun.to(u.m)
+lsun_w = u.L_sun.to(u.W)
+# irradiance at 1pc (W/m2) to luminosity (Lsun)
+irr_1pc_lsun = 4 * np.pi * pc_m**2 / lsun_w
+
 
 class BaseResult(object):
     """Basic class to compute and handle fitting results."""
 
-    @lru_cache(maxsize=128)
     def __init__(self,rawphot,model_comps):
-        """Basic instantiation of the Result object."""
+        """Basic instantiation of the Result object.
+
+        The multinest output directory is not created here, it is only
+        needed if fitting is (re)done.
+        """
         
-        self.file_info(rawphot,model_comps)
+        self.file_info(rawphot,model_comps,mkdir=False)
     
     
-    @lru_cache(maxsize=128)
-    def file_info(self,rawphot,model_comps):
-        """Basic file info."""
+    def file_info(self,rawphot,model_comps,mkdir=True):
+        """Basic file info.
+
+        Parameters
+        ----------
+        rawphot : str
+            Rawphot file from sdb.
+        model_comps : tuple of str
+            Tuple of model names.
+        mkdir : bool, optional
+            Create the multinest output directory if it doesn't exist.
+        """
                   
         # component info
         self.model_comps = model_comps
@@ -57,12 +75,13 @@ class BaseResult(object):
         self.path = os.path.dirname(rawphot)
         
         # id
-        self.id = os.path.basename(rawphot).rstrip('-rawphot.txt')
+        # id, slice rather than rstrip, which strips characters not a suffix
+        self.id = os.path.basename(rawphot)[:-len('-rawphot.txt')]
 
         # where the multinest output is (or will be), create if needed
         self.pmn_dir = self.path + '/' + self.id            \
                        + cfg.fitting['pmn_dir_suffix']
-        if not os.path.exists(self.pmn_dir):
+        if mkdir and not os.path.exists(self.pmn_dir):
             os.mkdir(self.pmn_dir)
         
         # the base name for multinest files
@@ -96,21 +115,13 @@ class BaseResult(object):
         # observations; keywords, tuples of photometry and spectra. if
         # there is nothing in the photometry file then don't fill
         # anything else
-        p = photometry.Photometry.read_sdb_file(self.rawphot)
-        if p is None:
-            return
-        elif np.sum(p.ignore) == p.nphot:
+        obs = load_obs(self.rawphot,nospec=nospec,
+                       rawphot_time=self.rawphot_time)
+        if obs is None:
             return
 
-        self.obs = (p,)
-        self.obs_keywords = utils.get_sdb_keywords(self.rawphot)
+        self.obs,self.obs_keywords = obs
         self.exclude_spectra = nospec
-        if not nospec:
-            s = spectrum.ObsSpectrum.read_sdb_file(self.rawphot,
-                                                   module_split=True,
-                                                   nspec=1)
-            if s is not None:
-                self.obs = (p,) + s
 
         # models
         mod,plmod = model.get_models(self.obs,self.model_comps)
@@ -129,7 +140,11 @@ class BaseResult(object):
         tmp = fitting.concat_obs(self.obs)
         self.obs_fnujy,self.obs_e_fnujy,self.obs_upperlim,self.filters_ignore,\
             obs_ispec,obs_nel,self.wavelengths,self.filters,self.obs_bibcode = tmp
-        spec_norm = np.take(self.best_params+[1.0],obs_ispec)
+        norms = np.empty(len(self.best_params)+1)
+        norms[:-1] = self.best_params
+        norms[-1] = 1.0
+        spec_norm = norms[obs_ispec]
+        # not in place, arrays from concat_obs are memoized
         self.obs_fnujy = self.obs_fnujy * spec_norm
         self.obs_e_fnujy = self.obs_e_fnujy * spec_norm
 
@@ -311,15 +326,14 @@ class BaseResult(object):
 
         # save for later in a pickle, updating the pickle_time to now
         self.pickle_time = time.time()
-        with open(self.pickle,'wb') as f:
-            pickle.dump(self,f)
+        utils.write_pickle(self,self.pickle,
+                           compress=cfg.fitting['compress_pickle'])
 
 
     def load(file):
         """Load a previously save result pickle."""
 
-        with open(file,'rb') as f:
-            r = pickle.load(f)
+        r = utils.read_pickle(file)
 
         # reload the necessary models (that weren't saved)
         r.models,r.pl_models = model.get_models(r.obs,r.model_comps)
@@ -452,10 +466,10 @@ class SampledResult(BaseResult):
         
         # rstar and lstar if star were at 1pc
         rstar_1pc_dist = np.sqrt(cfg.ssr * 10**self.comp_param_samples[i][:,-1]/np.pi) \
-                         * u.pc.to(u.m)
+                         * pc_m
         lstar_1pc_dist = 4 * np.pi * rstar_1pc_dist**2 \
                          * self.comp_param_samples[i][:,0]**4 \
-                         * 5.670373e-08 / u.L_sun.to(u.W)
+                         * 5.670373e-08 / lsun_w
 
         distributions['lstar_1pc'] = lstar_1pc_dist
         self.distributions['lstar_1pc_tot'] += lstar_1pc_dist
@@ -478,7 +492,7 @@ class SampledResult(BaseResult):
             star['e_lstar_hi'] = hi - star['lstar']
             star['e_lstar'] = (star['e_lstar_lo']+star['e_lstar_hi'])/2.0
      
-            rstar_dist = rstar_1pc_dist / self.distributions['parallax'] / u.R_sun.to(u.m)
+            rstar_dist = rstar_1pc_dist / self.distributions['parallax'] / rsun_m
             distributions['rstar'] = rstar_dist
             lo,star['rstar'],hi = np.percentile(rstar_dist,[16.0,50.0,84.0])
             star['e_rstar_lo'] = star['rstar'] - lo
@@ -533,19 +547,18 @@ class SampledResult(BaseResult):
                     distributions['tdisk'] = self.comp_param_samples[i][:,j]
 
         # disk and fractional luminosity
-        ldisk_1pc_dist = np.zeros(self.n_samples)
-        for j,par in enumerate(self.comp_param_samples[i]):
-            
-            # there will only be one SpecModel in the ith component
-            for m in self.pl_models[i]:
-                if not isinstance(m,model.SpecModel):
-                    continue
-                s = spectrum.ObsSpectrum(wavelength=m.wavelength,
-                                         fnujy=m.fnujy(par))
-                s.fill_irradiance()
+        # there will only be one SpecModel in the ith component, get the
+        # spectra for all samples at once
+        irradiance = np.zeros(self.n_samples)
+        for m in self.pl_models[i]:
+            if not isinstance(m,model.SpecModel):
+                continue
+            irradiance = spectrum.Spectrum.integrate_irradiance(
+                                spectrum.c_micron / m.wavelength,
+                                m.fnujy(self.comp_param_samples[i])
+                                                                )
 
-            ldisk_1pc_dist[j] = s.irradiance \
-                        * 4 * np.pi * (u.pc.to(u.m))**2 / u.L_sun.to(u.W)
+        ldisk_1pc_dist = irradiance * irr_1pc_lsun
         
         distributions['ldisk_1pc'] = ldisk_1pc_dist
         lo,disk_r['ldisk_1pc'],hi = np.percentile(ldisk_1pc_dist,[16.0,50.0,84.0])
@@ -588,7 +601,6 @@ class Result(SampledResult):
               with loaded pickles, which will still be Result.
     """
 
-    @lru_cache(maxsize=128)
     def get(rawphot,model_comps,update_mn=False,
             update_an=False,update_json=False,update_thumb=False,
             nospec=False):
@@ -632,14 +644,15 @@ class Result(SampledResult):
 
         self = Result(rawphot,model_comps)
 
-        # see if we have a pickle of results already
-        if os.path.exists(self.pickle):
-            with open(self.pickle,'rb') as f:
-                self = pickle.load(f)
-
-        # update object with local file info since processing may have
-        # been done elsewhere
-        self.file_info(rawphot,model_comps)
+        # see if we have a pickle of results already, if so update
+        # object with local file info since processing may have been
+        # done elsewhere
+        try:
+            self = utils.read_pickle(self.pickle)
+        except FileNotFoundError:
+            pass
+        else:
+            self.file_info(rawphot,model_comps,mkdir=False)
 
         # see if we can skip everything except the json
         if hasattr(self,'rawphot_time') and hasattr(self,'mn_time') and \
@@ -679,6 +692,40 @@ class Result(SampledResult):
         return self
 
 
+    def get_many(rawphot,model_comps_list,processes=1,**kwargs):
+        """Return a list of Results for several sets of models.
+
+        With more than one process the models are fitted simultaneously
+        in separate processes, not threads, since the fitting uses
+        module globals and changes the working directory.
+
+        Parameters
+        ----------
+        rawphot : str
+            Rawphot file from sdb.
+        model_comps_list : list of tuple of str
+            List of tuples of model names to fit.
+        processes : int, optional
+            Number of processes to use.
+        kwargs : dict, optional
+            Keywords passed to Result.get.
+
+        See Also
+        --------
+        result.Result.get
+        """
+
+        if processes < 2 or len(model_comps_list) < 2:
+            return [Result.get(rawphot,m,**kwargs) for m in model_comps_list]
+
+        # multinest may use OpenMP, so stop it competing with the pool
+        os.environ.setdefault('OMP_NUM_THREADS','1')
+
+        with Pool(processes=min(processes,len(model_comps_list))) as pool:
+            return pool.map(_get_one,[(rawphot,m,kwargs)
+                                      for m in model_comps_list])
+
+
     def run_multinest(self,update_mn=False):
         """Run multinest.
         
@@ -700,10 +747,15 @@ class Result(SampledResult):
         """
 
         import pymultinest as pmn
+
+        if not os.path.exists(self.pmn_dir):
+            os.mkdir(self.pmn_dir)
     
         # if we want to re-run multinest, delete previous output first
         run_mn = update_mn
-        if os.path.exists(self.pmn_base+'phys_live.points'):
+        live_points = self.pmn_base+'phys_live.points'
+        live_exists = os.path.exists(live_points)
+        if live_exists:
             if hasattr(self,'mn_time'):
                 if self.rawphot_time > self.mn_time:
                     run_mn = True
@@ -714,8 +766,8 @@ class Result(SampledResult):
 
         # check the number of live points in the previous run
         npt = 0
-        if os.path.exists(self.pmn_base+'phys_live.points'):
-            with open(self.pmn_base+'phys_live.points') as f:
+        if live_exists:
+            with open(live_points) as f:
                 for l in f: npt += 1
 
         # multinest does checkpointing, so we can force a re-run by
@@ -726,7 +778,7 @@ class Result(SampledResult):
         # we must go there, multinest only takes 100 char paths
         with utils.pushd(self.pmn_dir):
             fitting.multinest( self.obs,self.models,'.' )
-            self.mn_time = os.path.getmtime(self.pmn_base+'phys_live.points')
+            self.mn_time = os.path.getmtime(live_points)
 
         # update the analyzer if necessary
         get_a = False
@@ -742,38 +794,47 @@ class Result(SampledResult):
             self.analyzer = a
             self.mn_a_time = time.time()
 
-        # parameter fitting corner plot
+        # parameter fitting corner plot, an older plot is only redone if
+        # the samples have changed (checked below)
         plot = False
+        older = False
         if not os.path.exists(self.corner_plot):
             plot = True
         else:
             if os.path.getmtime(self.corner_plot) < self.mn_a_time:
-                plot = True
+                older = True
 
-        # parameter names and best fit
-        self.evidence = self.analyzer.get_stats()['global evidence']
+        # parameter names and best fit, get_stats reads the multinest
+        # output files so only call it once
+        stats = self.analyzer.get_stats()
+        self.evidence = stats['global evidence']
         self.parameters = self.model_info['parameters']
 
-        self.best_params = []
-        self.best_params_1sig = []
-        for i in range(len(self.parameters)):
-            self.best_params.append(self.analyzer.get_stats()\
-                                    ['marginals'][i]['median'])
-            self.best_params_1sig.append(self.analyzer.get_stats()\
-                                         ['marginals'][i]['sigma'])
+        marginals = stats['marginals'][:len(self.parameters)]
+        self.best_params = [m['median'] for m in marginals]
+        self.best_params_1sig = [m['sigma'] for m in marginals]
         
         # equally weighted samples for distributions, last column is loglike
         self.param_samples = self.analyzer.get_equal_weighted_posterior()[:,:-1]
-        if len(self.param_samples) > cfg.fitting['n_samples_max']:
-            self.param_samples = self.param_samples[:cfg.fitting['n_samples_max']]
+        n_max = cfg.fitting['n_samples_max']
+        if len(self.param_samples) > n_max:
+            self.param_samples = self.param_samples[:n_max]
         self.n_samples = len(self.param_samples)
 
-        # corner plot of parameters
+        # corner plot of parameters, an existing but older plot is kept
+        # if the samples are the same as those used to make it
+        if plot or older:
+            h = utils.data_hash(self.param_samples)
+            if older and not utils.hash_matches(self.corner_plot+'.hash',h):
+                plot = True
+
         if plot:
             fig = corner.corner(self.param_samples, show_titles=True,
                                 labels=self.model_info['parameters'])
             fig.savefig(self.corner_plot)
             plt.close(fig) # not doing this causes an epic memory leak
+            with open(self.corner_plot+'.hash','w') as f:
+                f.write(h)
 
         # split the parameters into components
         self.n_parameters = len(self.parameters)
@@ -787,10 +848,8 @@ class Result(SampledResult):
             self.comp_parameters += (comp[0].parameters,)
             self.comp_best_params += (self.best_params[i0:i0+nparam],)
             self.comp_best_params_1sig += (self.best_params_1sig[i0:i0+nparam],)
-            
-            comp_i_samples = ()
-            comp_i_samples = self.param_samples[:self.n_samples,i0:i0+nparam]
-            self.comp_param_samples += (comp_i_samples,)
+            # views of the sample array, not copies
+            self.comp_param_samples += (self.param_samples[:,i0:i0+nparam],)
 
             i0 += nparam
         
@@ -836,40 +895,26 @@ class Result(SampledResult):
                 lo_cut = -1. * ( self.obs_keywords['plx_value'] /   \
                                  self.obs_keywords['plx_err'] )
                                  
+                # inverse transform sampling of the truncated normal
+                p_lo = ndtr(lo_cut)
+                z = ndtri(p_lo + np.random.random(self.n_samples)*(1-p_lo))
                 self.distributions['parallax'] = \
-                    truncnorm.rvs(lo_cut,np.inf,
-                                  loc=self.obs_keywords['plx_value']/1e3,
-                                  scale=self.obs_keywords['plx_err']/1e3,
-                                  size=self.n_samples)
+                    ( self.obs_keywords['plx_value'] +
+                      self.obs_keywords['plx_err'] * z ) / 1e3
                     
         # observed fluxes
         obs_nel = self.fill_observations()
 
-        # model fluxes, including colours/indices
-        model_dist = np.zeros((len(self.filters),self.n_samples))
-        model_comp_dist = np.zeros((self.n_comps,len(self.filters),
-                                    self.n_samples))
+        # model fluxes, including colours/indices, evaluated for all
+        # samples at once
+        model_dist,model_comp_dist = \
+            model.model_fluxes(self.models,self.param_samples,obs_nel)
 
         # all fluxes, including colours/indices
-        p_all = photometry.Photometry(filters=filter.Filter.all)
+        p_all,p_all_mod = all_filter_models(self.model_comps)
         self.all_filters = p_all.filters
-        p_all_mod,_ = model.get_models((p_all,),self.model_comps)
-        all_dist = np.zeros((p_all.nphot,self.n_samples))
-        all_comp_dist = np.zeros((self.n_comps,p_all.nphot,
-                                    self.n_samples))
-
-        for i,par in enumerate(self.param_samples):
-
-            # TODO: compute once, grab model fluxes from all fluxes...
-            model_fnujy,model_comp_fnujy = \
-                model.model_fluxes(self.models,par,obs_nel)
-            model_dist[:,i] = model_fnujy
-            model_comp_dist[:,:,i] = model_comp_fnujy
-
-            all_fnujy,all_comp_fnujy = \
-                model.model_fluxes(p_all_mod,par,[p_all.nphot])
-            all_dist[:,i] = all_fnujy
-            all_comp_dist[:,:,i] = all_comp_fnujy
+        all_dist,all_comp_dist = \
+            model.model_fluxes(p_all_mod,self.param_samples,[p_all.nphot])
 
         # summed model fluxes
         self.distributions['model_fnujy'] = model_dist
@@ -893,13 +938,9 @@ class Result(SampledResult):
         self.dof = len(self.wavelengths)-len(self.parameters)-1
 
         # star and disk photometry for all filters
-        star_phot_dist = np.zeros((p_all.nphot,self.n_samples))
-        disk_phot_dist = np.zeros((p_all.nphot,self.n_samples))
-        for i,comp in enumerate(self.model_comps):
-            if self.star_or_disk[i] == 'star':
-                star_phot_dist += all_comp_dist[i,:,:]
-            elif self.star_or_disk[i] == 'disk':
-                disk_phot_dist += all_comp_dist[i,:,:]
+        star_or_disk = np.array(self.star_or_disk)
+        star_phot_dist = np.sum(all_comp_dist[star_or_disk == 'star'],axis=0)
+        disk_phot_dist = np.sum(all_comp_dist[star_or_disk == 'disk'],axis=0)
 
         # star photometry in all filters
         self.distributions['star_phot'] = star_phot_dist
@@ -955,20 +996,19 @@ class Result(SampledResult):
                 plot = True
 
         if plot:
-            samples = np.zeros(self.n_samples)
+            dists = []
             labels = []
             if 'parallax' in self.distributions.keys():
-                samples = np.vstack((samples,self.distributions['parallax']))
+                dists.append(self.distributions['parallax'])
                 labels.append('parallax')
-            for dist in self.star_distributions:
+            for dist in self.star_distributions + self.disk_r_distributions:
                 for key in dist.keys():
-                    samples = np.vstack((samples,dist[key]))
+                    dists.append(dist[key])
                     labels.append(key)
-            for dist in self.disk_r_distributions:
-                for key in dist.keys():
-                    samples = np.vstack((samples,dist[key]))
-                    labels.append(key)
-            samples = samples[1:]
+
+            samples = np.empty((len(dists),self.n_samples))
+            for i,dist in enumerate(dists):
+                samples[i] = dist
 
             fig = corner.corner(samples.transpose(),
                                 show_titles=True, labels=labels)
@@ -979,9 +1019,75 @@ class Result(SampledResult):
     def delete_multinest(self):
         """Delete multinest output so it can be run again."""
 
-        fs = glob.glob(self.pmn_base+'*')
-        for f in fs:
-            os.remove(f)
+        prefix = os.path.basename(self.pmn_base)
+        for entry in os.scandir(self.pmn_dir):
+            if entry.name.startswith(prefix) and entry.is_file():
+                os.remove(entry.path)
+
+
+def _get_one(args):
+    """Call Result.get in a pool process, args is (rawphot,comps,kwargs)."""
+    rawphot,model_comps,kwargs = args
+    return Result.get(rawphot,model_comps,**kwargs)
+
+
+@lru_cache(maxsize=2)
+def load_obs(rawphot,nospec=False,rawphot_time=None):
+    """Return observations and keywords from a rawphot file.
+
+    Returns None if there is no (unignored) photometry. This is
+    memoized so that the file is only read once when several models
+    are fitted to the same target, the observations are not modified
+    so can be shared by the Result for each model.
+
+    Parameters
+    ----------
+    rawphot : str
+        Rawphot file from sdb.
+    nospec : bool, optional
+        Don't include any spectra.
+    rawphot_time : float, optional
+        Modification time of rawphot, so that a changed file is re-read.
+    """
+
+    p = photometry.Photometry.read_sdb_file(rawphot)
+    if p is None:
+        return
+    elif np.sum(p.ignore) == p.nphot:
+        return
+
+    obs = (p,)
+    if not nospec:
+        s = spectrum.ObsSpectrum.read_sdb_file(rawphot,module_split=True,
+                                               nspec=1)
+        if s is not None:
+            obs = (p,) + s
+
+    return obs,utils.get_sdb_keywords(rawphot)
+
+
+@lru_cache(maxsize=1)
+def all_filter_photometry():
+    """Return an empty Photometry object with all filters."""
+    return photometry.Photometry(filters=filter.Filter.all)
+
+
+@lru_cache(maxsize=16)
+def all_filter_models(model_comps):
+    """Return Photometry with all filters and the models for it.
+
+    This is memoized since the models only depend on the components,
+    so can be shared by results for different targets. Neither the
+    photometry or the models are modified by the analysis.
+
+    Parameters
+    ----------
+    model_comps : tuple of str
+        Tuple of model names.
+    """
+    p_all = all_filter_photometry()
+    p_all_mod,_ = model.get_models((p_all,),model_comps)
+    return p_all,p_all_mod
 
 
 def sort_results(results):
@@ -1,14 +1,12 @@
 import os
 import glob
+import fcntl
+import fnmatch
 import argparse
+from multiprocessing import Pool
+from concurrent.futures import ThreadPoolExecutor
 
-import filelock
-
-from sdf import fitting
-from sdf import plotting
-from sdf import tables
 from sdf import db
-from sdf import www
 from sdf import config as cfg
 
 
@@ -53,6 +51,15 @@ def sdf_fit():
     parser1.add_argument('--update-thumb','-t',action='store_true',
                          help='Force udpate of SED thumbnail image')
 
+    parser1.add_argument('--quick-update-check',action='store_true',
+                         help='Skip targets with index.html newer than '
+                              'all other files')
+
+    parser1.add_argument('--processes','-p',type=int,
+                         default=cfg.calc['cpu'],
+                         help='Number of processes, used for targets '
+                              'or for the models of a single target')
+
     args = parser1.parse_args()
     
     # collect the files
@@ -60,51 +67,250 @@ def sdf_fit():
         files = args.file[0]
 
     elif args.dir is not None:
+        files = []
         for d in args.dir[0]:
-            d.rstrip('/')
-            files = glob.glob(os.path.abspath(d)+'/**/'\
-                              +args.subset[0]+'/*-rawphot.txt',
-                              recursive=True)
+            files += _rawphot_files_walk(os.path.abspath(d),args.subset[0])
 
     elif args.samples is not None:
-        ids = []
+        ids = set()
         for s in args.samples:
-            ids += db.sample_targets(s)
+            ids.update(db.sample_targets(s))
         files = []
         for id in ids:
-            files += glob.glob( cfg.file['sdb_root']+'masters/'\
-                               +id+'/**/*-rawphot.txt' )
-
-    # one at a time, locking before we start
-    for f in files:
-        
-        lock = filelock.FileLock(os.path.dirname(os.path.abspath(f))
-                                 +'/.sdf_lock-'
-                                 +os.path.basename(f))
-        try:
-            with lock.acquire(timeout = 0):
-                
-                print(f)
+            files += _rawphot_files(cfg.file['sdb_root']+'masters/'+id)
+
+    # remove duplicates, sorting so that runs are done in the same order
+    files = sorted(set([os.path.abspath(f) for f in files]))
+
+    # options needed for each file, a dict of builtins is safe to
+    # pickle when passing to pool processes
+    flags = {'quick_update_check': args.quick_update_check,
+             'update_mn': args.update_all,
+             'update_an': args.update_analysis,
+             'update_json': args.update_json,
+             'update_thumb': args.update_thumb,
+             'nospec': args.no_spectra,
+             'www': args.www or args.update_www,
+             'update_www': args.update_www,
+             'db': args.dbwrite or args.update_db,
+             'update_db': args.update_db,
+             'processes': 1}
+
+    # with only one target use the processes for its models instead
+    if len(files) == 1:
+        flags['processes'] = args.processes
+
+    # multinest may use OpenMP, so stop it competing with the processes
+    if args.processes > 1:
+        os.environ.setdefault('OMP_NUM_THREADS','1')
+
+    # locking before we start on each, in parallel if we can
+    if args.processes > 1 and len(files) > 1:
+
+        with Pool(processes=args.processes) as pool:
+            for _ in pool.imap_unordered(process_file,
+                                         [(f,flags) for f in files],
+                                         chunksize=1):
+                pass
+    else:
+        # overlap writing www/db output for a target with the next fit
+        futures = []
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            for f in files:
+                futures += process_file((f,flags),executor=executor)
+
+        # raise any exceptions from the output threads
+        for fut in futures:
+            fut.result()
+
+
+def process_file(params,executor=None):
+    """Fit a single rawphot file, skipping it if locked elsewhere.
+
+    Returns a (possibly empty) list of futures for www/db output. The
+    lock on the target is held until this output is written.
+
+    Parameters
+    ----------
+    params : tuple
+        Tuple of absolute rawphot file name and dict of sdf-fit options.
+    executor : concurrent.futures.Executor, optional
+        Submit www and db output to this executor rather than doing
+        them here, so they can run while the next target is fitted.
+        The lock is released by the submitted job.
+    """
+
+    f,flags = params
+    dir = os.path.dirname(f)
+
+    # skip if nothing has changed since the www material was written
+    if flags['quick_update_check'] and _www_up_to_date(dir):
+        return []
+
+    # fitting imports are slow, so only do them once we know we need them
+    from sdf import fitting
+
+    # skip if another process is already working on this target
+    fd = _try_lock(dir+'/.sdf_lock-'+os.path.basename(f))
+    if fd is None:
+        return []
+
+    try:
+        print(f)
+
+        # evidence-sorted list of results
+        results = fitting.fit_results(f,
+                                      update_mn=flags['update_mn'],
+                                      update_an=flags['update_an'],
+                                      update_json=flags['update_json'],
+                                      update_thumb=flags['update_thumb'],
+                                      nospec=flags['nospec'],
+                                      processes=flags['processes'])
+        if results is None:
+            return []
+
+        # output releases the lock when done, so keep it until then, and
+        # hand it over so it isn't released here too
+        if executor is None:
+            lock_fd,fd = fd,None
+            _write_output(results,flags,lock_fd)
+            return []
+        else:
+            fut = executor.submit(_write_output,results,flags,fd)
+            fd = None
+            return [fut]
+
+    finally:
+        if fd is not None:
+            _unlock(fd)
+
+
+def _write_output(results,flags,fd):
+    """Write www and db output for results, then release the lock fd.
+
+    www and db output are done in turn, and the lock is kept until both
+    are finished so that another process can't start on the target
+    while they are being written.
+    """
+
+    try:
+        if flags['www']:
+            from sdf import www
+            www.www_all(results,update=flags['update_www'])
+
+        # write best model to db
+        if flags['db']:
+            db.write_all(results[0],update=flags['update_db'])
+
+    finally:
+        _unlock(fd)
+
+
+def _try_lock(file):
+    """Return a descriptor for file with an exclusive lock, or None.
+
+    The lock is non-blocking, so None is returned straight away if
+    another process holds the lock.
+    """
+
+    fd = os.open(file,os.O_RDWR|os.O_CREAT)
+    try:
+        fcntl.flock(fd,fcntl.LOCK_EX|fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+
+    return fd
+
+
+def _unlock(fd):
+    """Release the lock on and close a descriptor from _try_lock."""
+    fcntl.flock(fd,fcntl.LOCK_UN)
+    os.close(fd)
+
+
+def _rawphot_files(root):
+    """Return *-rawphot.txt files in the directories just below root.
+
+    Hidden files (e.g. lock files) are skipped, as they are by glob.
+    """
+
+    files = []
+    try:
+        dirs = [d.path for d in os.scandir(root)
+                if d.is_dir() and d.name[0] != '.']
+    except FileNotFoundError:
+        return files
+
+    for d in dirs:
+        for entry in os.scandir(d):
+            if entry.name.endswith('-rawphot.txt') \
+                    and entry.name[0] != '.':
+                files.append(entry.path)
+
+    return files
+
 
-                # evidence-sorted list of results
-                results = fitting.fit_results(os.path.abspath(f),
-                                              update_mn=args.update_all,
-                                              update_an=args.update_analysis,
-                                              update_json=args.update_json,
-                                              update_thumb=args.update_thumb,
-                                              nospec=args.no_spectra)
-                if results is None:
-                    continue
+def _rawphot_files_walk(root,subset='*'):
+    """Return *-rawphot.txt files anywhere below root.
 
-                if args.www or args.update_www:
-                    www.www_all(results,update=args.update_www)
+    The directory the files are in must match the subset pattern, which
+    can have shell-style wildcards. Hidden files and directories are
+    skipped and symlinked directories are followed, as they are by glob.
+    """
 
-                # write best model to db
-                if args.dbwrite or args.update_db:
-                    db.write_all(results[0],update=args.update_db)
+    files = []
+    for dirpath,dirnames,filenames in os.walk(root,followlinks=True):
+        dirnames[:] = [d for d in dirnames if d[0] != '.']
+        if dirpath == root or \
+                not fnmatch.fnmatch(os.path.basename(dirpath),subset):
+            continue
+        files += [os.path.join(dirpath,f) for f in filenames
+                  if f.endswith('-rawphot.txt') and f[0] != '.']
 
-        except filelock.Timeout:
-            pass
+    return files
+
+
+def _www_up_to_date(dir):
+    """Return True if index.html in dir is newer than the other files.
+
+    Files that sdf writes on every run (f_limits.html is written after
+    index.html, the thumbnail by fit_results, and the lock files) are
+    not counted.
+    """
+
+    try:
+        t_index = os.stat(dir+'/index.html').st_mtime
+    except FileNotFoundError:
+        return False
+
+    ignore = ('index.html','f_limits.html','*_thumb.png','.sdf_lock-*')
+    return not _any_newer_than(dir,t_index,ignore=ignore)
+
+
+def _any_newer_than(root,t,ignore=()):
+    """Return True if any file under root was modified after time t.
+
+    Uses os.scandir, for which the stat results are cached by each
+    DirEntry, and returns as soon as a newer file is found. Files and
+    directories with names matching any of the shell-style patterns in
+    ignore are skipped, as are any that can't be stat'd (e.g. broken
+    symlinks).
+    """
+
+    for entry in os.scandir(root):
+        if any([fnmatch.fnmatch(entry.name,p) for p in ignore]):
+            continue
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                if _any_newer_than(entry.path,t,ignore=ignore):
+                    return True
+            elif entry.stat().st_mtime > t:
+                return True
+        except OSError:
+            continue
+
+    return False
 
 
 def sdf_sample():
@@ -124,6 +330,10 @@ def sdf_sample():
                         help='Remove unneccessary sample dirs')
     args = parser.parse_args()
 
+    from sdf import tables
+    from sdf import plotting
+    from sdf import www
+
     if args.tables:
         print("Updating sample tables")
         tables.sample_tables(args.samples)
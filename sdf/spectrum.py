@@ -145,9 +145,32 @@ class Spectrum(object):
         
         self.sort('nu')
         if isinstance(self,ObsSpectrum):
-            self.irradiance = 1e-26 * utils.sdf_int(self.fnujy,self.nu_hz)
+            self.irradiance = Spectrum.integrate_irradiance(self.nu_hz,
+                                                            self.fnujy)
         elif isinstance(self,ModelSpectrum):
-            self.irradiance_sr = 1e-26 * utils.sdf_int(self.fnujy_sr,self.nu_hz)
+            self.irradiance_sr = Spectrum.integrate_irradiance(self.nu_hz,
+                                                               self.fnujy_sr)
+
+
+    @staticmethod
+    def integrate_irradiance(nu_hz,fnujy):
+        """Return the irradiance for spectra.
+
+        Units are W/m2 for fluxes in Jy, W/m2/sr for Jy/sr. The
+        frequencies need not be sorted, duplicates are removed as for
+        `sort`. The fluxes may have a second dimension for multiple
+        spectra, in which case an irradiance for each is returned.
+
+        Parameters
+        ----------
+        nu_hz : numpy.ndarray
+            Frequencies in Hz.
+        fnujy : numpy.ndarray
+            Fluxes, first dimension the same length as nu_hz.
+        """
+
+        _,srt = np.unique( nu_hz, return_index=True )
+        return 1e-26 * utils.sdf_int(fnujy[srt],nu_hz[srt],axis=0)
 
         
     def fill_wave2hz(self):
@@ -2,6 +2,7 @@ from functools import lru_cache
 from contextlib import contextmanager
 import os
 import glob
+import pickle
 from hashlib import sha1
 
 from scipy import sparse
@@ -12,6 +13,12 @@ from astropy.table import Table
 from astropy.coordinates import ICRS
 import astropy.units as u
 
+try:
+    import lz4.frame
+    lz4_module = True
+except ImportError:
+    lz4_module = False
+
 # do this first, since SdfError called in config
 # TODO: presumably there is a way to avoid this...
 class SdfError(Exception):
@@ -23,6 +30,13 @@ from . import config as cfg
 
 c_micron = u.micron.to(u.Hz,equivalencies=u.spectral())
 
+# pickle protocol for results, 4 is the newest readable by python 3.5
+# and still stores numpy arrays as raw bytes
+pickle_protocol = 4
+
+# first bytes of an lz4 frame, plain pickles start with b'\x80'
+lz4_magic = b'\x04\x22\x4d\x18'
+
 
 @contextmanager
 def pushd(new_dir):
@@ -67,12 +81,59 @@ def bnu_nu_hz(nu_hz,temp):
     return bnu_wav_micron(wav_um,temp)
 
 
-def sdf_int(y,x):
+def sdf_int(y,x,axis=-1):
     """Decide how we do integration in sdf."""
-    return np.trapz(y,x)
+    return np.trapz(y,x,axis=axis)
 #    return simps(y,x)
 
 
+def data_hash(a):
+    """Return a hex digest of the data in an array."""
+    a = np.ascontiguousarray(a)
+    return sha1(a.view(np.uint8)).hexdigest()
+
+
+def hash_matches(file,h):
+    """Return True if file exists and contains the hash h."""
+    try:
+        with open(file) as f:
+            return f.read() == h
+    except FileNotFoundError:
+        return False
+
+
+def write_pickle(obj,file,compress=False):
+    """Pickle obj to file, compressed with lz4 if asked and available."""
+    if compress and lz4_module:
+        with lz4.frame.open(file,'wb') as f:
+            pickle.dump(obj,f,protocol=pickle_protocol)
+    else:
+        with open(file,'wb') as f:
+            pickle.dump(obj,f,protocol=pickle_protocol)
+
+
+def read_pickle(file):
+    """Return object from a pickle file, which may be lz4 compressed."""
+    with open(file,'rb') as f:
+        if f.peek(4)[:4] == lz4_magic:
+            if not lz4_module:
+                raise SdfError("need lz4 to read compressed pickle {}".
+                               format(file))
+            with lz4.frame.open(f,'rb') as fz:
+                return pickle.load(fz)
+        else:
+            return pickle.load(f)
+
+
+def loads_pickle(s):
+    """Return object from pickle bytes, which may be lz4 compressed."""
+    if s[:4] == lz4_magic:
+        if not lz4_module:
+            raise SdfError("need lz4 to read compressed pickle")
+        s = lz4.frame.decompress(s)
+    return pickle.loads(s)
+
+
 def validate_1d(value,expected_len,dtype=float):
     
     if type(value) in [list, tuple]:
@@ -5,8 +5,6 @@ import os
 import glob
 from datetime import datetime
 
-import numpy as np
-
 import jinja2
 from bokeh.resources import CDN,INLINE
 
@@ -44,11 +42,8 @@ def www_all(results, write_path=None, sed_file='index.html',
 
     # see whether index.html needs updating (unless update enforced)
     if os.path.exists(file):
-        mtime = []
-        for r in results:
-            mtime.append( r.pickle_time )
-
-        if os.path.getmtime(file) > np.max(mtime):
+        t_file = os.path.getmtime(file)
+        if all(r.pickle_time < t_file for r in results):
             if not update:
                 print("   no update needed")
                 return
@@ -9,4 +9,5 @@ import sdf.model
 import sdf.photometry
 import sdf.spectrum
 import sdf.config
-import sdf.utils
\ No newline at end of file
+import sdf.utils
+import sdf.scripts
\ No newline at end of file
@@ -11,3 +11,31 @@ def test_read_model_keep_filters():
     assert( np.array_equal(m1.filters,['BS_YS','MIPS24','BS','YS']) )
     m1.keep_filters(fs,colour_bases=False)
     assert( np.array_equal(m1.filters,['BS_YS','MIPS24']) )
+
+def test_model_fluxes_samples_phot():
+    m = sdf.model.PhotModel.read_model('kurucz-0.0')
+    fs = ['BS_YS','MIPS24']
+    m.keep_filters(fs,colour_bases=True)
+    par = np.array([[6300,4.5,-3],[5800,4.0,-2.5]])
+    mod_fnu,comp_fnu = sdf.model.model_fluxes( (m,), par, [2] )
+    assert(mod_fnu.shape == (2,2))
+    assert(comp_fnu.shape == (1,2,2))
+    for i,p in enumerate(par):
+        fnu,_ = sdf.model.model_fluxes( (m,), p, [2] )
+        assert(np.allclose(mod_fnu[:,i],fnu))
+
+def test_model_fluxes_samples_spec():
+    m = sdf.model.SpecModel.read_model('kurucz-0.0')
+    nwav = len(m.wavelength)
+    par = np.array([[6300,4.5,-3],[5800,4.0,-2.5],[9000,3.5,-1]])
+    fnu = m.fnujy(par)
+    assert(fnu.shape == (nwav,3))
+    mod_fnu,comp_fnu = sdf.model.model_fluxes( ((m,),(m,)),
+                                               np.hstack((par,par[::-1])),
+                                               [nwav] )
+    assert(mod_fnu.shape == (nwav,3))
+    assert(comp_fnu.shape == (2,nwav,3))
+    for i,p in enumerate(par):
+        assert(np.allclose(fnu[:,i],m.fnujy(p)))
+        assert(np.allclose(comp_fnu[0,:,i],m.fnujy(p)))
+        assert(np.allclose(mod_fnu[:,i],m.fnujy(p)+m.fnujy(par[::-1][i])))
@@ -0,0 +1,57 @@
+import os
+import glob
+import tempfile
+
+from .context import sdf
+
+def test_scripts_rawphot_files_walk():
+    with tempfile.TemporaryDirectory() as root:
+        for d in ['a/t1','a/b/t2','c/t3','.h/t4','a/.t5','t6']:
+            os.makedirs(root+'/'+d)
+            open(root+'/'+d+'/x-rawphot.txt','w').close()
+            open(root+'/'+d+'/.x-rawphot.txt','w').close()
+        os.makedirs(root+'/elsewhere/t7')
+        open(root+'/elsewhere/t7/x-rawphot.txt','w').close()
+        os.symlink(root+'/elsewhere/t7',root+'/a/t7')
+        for subset in ['*','t*','t1']:
+            fs = glob.glob(root+'/**/'+subset+'/*-rawphot.txt',
+                           recursive=True)
+            walk = sdf.scripts._rawphot_files_walk(root,subset)
+            assert(sorted(fs) == sorted(walk))
+
+def test_scripts_www_up_to_date():
+    with tempfile.TemporaryDirectory() as root:
+        os.makedirs(root+'/x-mnest')
+        for f in ['x-rawphot.txt','x-mnest/m_.pkl','index.html',
+                  'f_limits.html','x_thumb.png','.sdf_lock-x-rawphot.txt']:
+            open(root+'/'+f,'w').close()
+        for f in ['x-rawphot.txt','x-mnest/m_.pkl']:
+            os.utime(root+'/'+f,(1000,1000))
+        os.utime(root+'/index.html',(2000,2000))
+
+        # files written by sdf on every run are newer, but don't count
+        for f in ['f_limits.html','x_thumb.png','.sdf_lock-x-rawphot.txt']:
+            os.utime(root+'/'+f,(3000,3000))
+        os.symlink(root+'/missing',root+'/broken')
+        assert(sdf.scripts._www_up_to_date(root))
+
+        # new results, or no index.html
+        os.utime(root+'/x-mnest/m_.pkl',(3000,3000))
+        assert(not sdf.scripts._www_up_to_date(root))
+        os.remove(root+'/index.html')
+        assert(not sdf.scripts._www_up_to_date(root))
+
+def test_scripts_any_newer_than():
+    with tempfile.TemporaryDirectory() as root:
+        os.makedirs(root+'/a/b')
+        for f in ['x','a/y','a/b/z']:
+            open(root+'/'+f,'w').close()
+            os.utime(root+'/'+f,(1000,1000))
+        assert(not sdf.scripts._any_newer_than(root,2000))
+        assert(sdf.scripts._any_newer_than(root,500))
+
+        # newer file in a nested directory, unless ignored
+        os.utime(root+'/a/b/z',(3000,3000))
+        assert(sdf.scripts._any_newer_than(root,2000))
+        assert(not sdf.scripts._any_newer_than(root,2000,ignore=('z',)))
+        assert(not sdf.scripts._any_newer_than(root,2000,ignore=('b',)))
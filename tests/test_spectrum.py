@@ -1,5 +1,7 @@
 import os
 
+import numpy as np
+
 from .context import sdf
 
 def test_read_phoenix():
@@ -13,3 +15,14 @@ def test_read_phoenix():
                     dir+'lte058-4.5-0.0a+0.0.BT-Settl.7.bz2'
                                                 )
     os.unlink(dir+'lte058-4.5-0.0a+0.0.BT-Settl.7.bz2.npy')
+
+def test_integrate_irradiance():
+    wav = np.append(np.logspace(0,3,50),[10.0,10.0])
+    fnujy = np.random.uniform(size=(len(wav),4))
+    irr = sdf.spectrum.Spectrum.integrate_irradiance(
+                                    sdf.spectrum.c_micron/wav,fnujy)
+    assert(irr.shape == (4,))
+    for i in range(4):
+        s = sdf.spectrum.ObsSpectrum(wavelength=wav,fnujy=fnujy[:,i])
+        s.fill_irradiance()
+        assert(np.isclose(irr[i],s.irradiance,rtol=1e-14,atol=0))
@@ -1,3 +1,6 @@
+import tempfile
+
+import pytest
 import numpy as np
 
 from .context import sdf
@@ -9,3 +12,40 @@ def test_utils_plot_join_line():
     x,y = sdf.utils.plot_join_line(t,'id','x','y')
     assert(np.all(np.equal(x,[2,4])))
     assert(np.all(np.equal(y,[6,8])))
+
+def test_utils_pickle_round_trip():
+    d = {'a':np.arange(10.),'b':'x'}
+    with tempfile.TemporaryDirectory() as tmp:
+        file = tmp+'/d.pkl'
+        sdf.utils.write_pickle(d,file)
+        r = sdf.utils.read_pickle(file)
+        assert(np.array_equal(r['a'],d['a']) and r['b'] == d['b'])
+        with open(file,'rb') as f:
+            r = sdf.utils.loads_pickle(f.read())
+        assert(np.array_equal(r['a'],d['a']) and r['b'] == d['b'])
+
+@pytest.mark.skipif(not sdf.utils.lz4_module, reason='lz4 not installed')
+def test_utils_pickle_round_trip_lz4():
+    d = {'a':np.zeros(1000),'b':'x'}
+    with tempfile.TemporaryDirectory() as tmp:
+        file = tmp+'/d.pkl'
+        sdf.utils.write_pickle(d,file,compress=True)
+        with open(file,'rb') as f:
+            s = f.read()
+        assert(s[:4] == sdf.utils.lz4_magic)
+        r = sdf.utils.read_pickle(file)
+        assert(np.array_equal(r['a'],d['a']) and r['b'] == d['b'])
+        r = sdf.utils.loads_pickle(s)
+        assert(np.array_equal(r['a'],d['a']) and r['b'] == d['b'])
+
+def test_utils_pickle_lz4_missing(monkeypatch):
+    monkeypatch.setattr(sdf.utils,'lz4_module',False)
+    s = sdf.utils.lz4_magic + b'not really compressed'
+    with tempfile.TemporaryDirectory() as tmp:
+        file = tmp+'/d.pkl'
+        with open(file,'wb') as f:
+            f.write(s)
+        with pytest.raises(sdf.utils.SdfError):
+            sdf.utils.read_pickle(file)
+    with pytest.raises(sdf.utils.SdfError):
+        sdf.utils.loads_pickle(s)